@@ -4,6 +4,11 @@ import plotly.graph_objects as go
 from scipy.interpolate import CubicSpline
 from streamlit_drawable_canvas import st_canvas
 import time
+import sys
+import threading
+import weakref
+import epicycle_export
+from concurrent.futures.process import BrokenProcessPool
 
 # 尝试导入 OpenAI，如果未安装则由 fallback 处理
 try:
@@ -126,6 +131,7 @@ def render_ai_chat_area():
     """侧边栏全局问答区"""
     if "chat_history" not in st.session_state:
         st.session_state.chat_history = []
+    compact_chat_history()
         
     # 放在侧边栏底部
     with st.sidebar.expander("🤖 傅里叶小助手：问我问题", expanded=False):
@@ -140,7 +146,7 @@ def render_ai_chat_area():
         
         if user_query:
             # 1. User Message
-            st.session_state.chat_history.append({"role": "user", "content": user_query})
+            append_chat_message("user", user_query)
             
             # 2. AI Response
             context_prompt = f"请简短地用中文回答关于傅里叶变换或信号处理的问题: {user_query}。字数控制在100字以内。"
@@ -150,7 +156,7 @@ def render_ai_chat_area():
             if ai_reply is None:
                 ai_reply = "傅里叶小助手: [系统离线] 抱歉，无法连接到大脑。可能是 Key 未配置或网络问题。"
             
-            st.session_state.chat_history.append({"role": "assistant", "content": ai_reply})
+            append_chat_message("assistant", ai_reply)
             st.rerun()
 
 # --- 预设文本库 (Fallbacks) ---
@@ -289,21 +295,25 @@ def render_page_1d():
 
     def on_preset_change():
         preset = st.session_state.preset_1d
+        nodes = None
         if preset == "方波":
-             st.session_state.sliders_1d = [1.0, 1.0, 1.0, 1.0, -1.0, -1.0, -1.0, -1.0]
+             nodes = [1.0, 1.0, 1.0, 1.0, -1.0, -1.0, -1.0, -1.0]
         elif preset == "正弦波":
-             st.session_state.sliders_1d = [0.0, 0.7, 1.0, 0.7, 0.0, -0.7, -1.0, -0.7]
+             nodes = [0.0, 0.7, 1.0, 0.7, 0.0, -0.7, -1.0, -0.7]
         elif preset == "三角波":
-             st.session_state.sliders_1d = [0.0, 0.5, 1.0, 0.5, 0.0, -0.5, -1.0, -0.5]
+             nodes = [0.0, 0.5, 1.0, 0.5, 0.0, -0.5, -1.0, -0.5]
         elif preset == "锯齿波":
-             st.session_state.sliders_1d = np.linspace(1.0, -1.0, 8).tolist()
+             nodes = np.linspace(1.0, -1.0, 8)
+        if nodes is not None:
+             # 节点以紧凑的 float32 数组保存在 session_state 中
+             st.session_state.sliders_1d = np.asarray(nodes, dtype=np.float32)
         
         update_analysis_preset()
     
     st.sidebar.selectbox("选择预设波形", preset_options, key="preset_1d", on_change=on_preset_change)
     
     if 'sliders_1d' not in st.session_state:
-        st.session_state.sliders_1d = [0.0, 0.7, 1.0, 0.7, 0.0, -0.7, -1.0, -0.7]
+        st.session_state.sliders_1d = np.array([0.0, 0.7, 1.0, 0.7, 0.0, -0.7, -1.0, -0.7], dtype=np.float32)
 
     cols = st.sidebar.columns(2)
     new_sliders = []
@@ -311,7 +321,7 @@ def render_page_1d():
         with cols[i%2]:
             val = st.slider(f"P{i}", -2.0, 2.0, value=float(st.session_state.sliders_1d[i]), key=f"s_{i}")
             new_sliders.append(val)
-    st.session_state.sliders_1d = new_sliders 
+    st.session_state.sliders_1d = np.asarray(new_sliders, dtype=np.float32)
     
     # --- Processing ---
     # Interpolation
@@ -405,6 +415,139 @@ def render_page_1d():
 # ==========================================
 # 4. 页面二：二维绘图艺术馆
 # ==========================================
+def get_animation_times(n_frames=120):
+    """动画各帧对应的时刻 (在线动画与离线导出共用)"""
+    # 修改关键点：让时间稍微小于 1.0 (例如 0.99)，
+    # 避免 t=1.0 时傅里叶级数严格回到起点 (周期性)，从而在视觉上产生闭合
+    return np.linspace(0, 0.995, n_frames)
+
+def get_view_box(orig_x_visual, orig_y_visual):
+    """根据原始路径计算视窗 (mid_x, mid_y, span)"""
+    if len(orig_x_visual) > 0:
+        min_x, max_x = np.nanmin(orig_x_visual), np.nanmax(orig_x_visual)
+        min_y, max_y = np.nanmin(orig_y_visual), np.nanmax(orig_y_visual)
+        span = max(max_x - min_x, max_y - min_y) * 1.3
+        mid_x, mid_y = (min_x + max_x)/2, (min_y + max_y)/2
+    else:
+         mid_x, mid_y = 150, 150
+         span = 300
+    return float(mid_x), float(mid_y), float(span)
+
+def build_epicycle_figure(sel_comps, center, orig_x_visual, orig_y_visual):
+    """构建 Epicycle 动画 Figure (含全部帧)"""
+    # Frames setting
+    times = get_animation_times()
+    n_frames = len(times)
+    
+    # Init Figure with Dark Background
+    fig = go.Figure()
+
+    # --- Pre-calculate State At t=0 for Initialization ---
+    # 这一步至关重要：如果初始 Trace 数据为空，Plotly 动画可能无法正确渲染后续帧的线条和形状。
+    # 我们先计算出第一帧的数据，填入初始 Figure 中，确保“所见即所得”。
+    init_vx, init_vy, init_cx, init_cy, init_tip = get_epicycle_geometry(sel_comps, times[0], center)
+    
+    # 1. Original Path (Trace 0)
+    fig.add_trace(go.Scatter(
+        x=orig_x_visual, y=orig_y_visual, 
+        mode='lines', 
+        line=dict(color='grey', dash='dot', width=1), 
+        connectgaps=False, # Important
+        name='原始路径',
+        hoverinfo='skip'
+    ))
+    
+    # 2. Drawn Path (Trace 1)
+    # 初始化为起点，而不是空列表
+    fig.add_trace(go.Scatter(
+        x=[init_tip.real], y=[init_tip.imag], 
+        mode='lines', 
+        line=dict(color='#00FFFF', width=4), 
+        name='重构路径'
+    ))
+    
+    # 3. Vectors (Trace 2)
+    # 初始化为 t=0 时的矢量链
+    fig.add_trace(go.Scatter(
+        x=init_vx, y=init_vy, 
+        mode='lines+markers', 
+        line=dict(color='#FFFF00', width=2), 
+        marker=dict(size=4, color='white'),
+        connectgaps=False, # CRITICAL for Vectors
+        name='矢量链'
+    ))
+    
+    # 4. Circles (Trace 3)
+    # 初始化为 t=0 时的圆
+    fig.add_trace(go.Scatter(
+        x=init_cx, y=init_cy, 
+        mode='lines', 
+        opacity=0.3, 
+        line=dict(color='grey', width=1), 
+        connectgaps=False, # CRITICAL for Circles
+        name='矢量圆',
+        hoverinfo='skip'
+    ))
+    
+    # 5. Pen Tip (Trace 4)
+    # 初始化为 t=0 时的笔尖
+    fig.add_trace(go.Scatter(
+        x=[init_tip.real], y=[init_tip.imag],
+        mode='markers',
+        marker=dict(color='red', size=5),
+        name='笔尖'
+    ))
+
+    # Generate Frames
+    # 已绘制路径预分配为 float32 缓冲区，每帧只取前 k+1 个点
+    frames = []
+    drawn_path = np.empty((2, n_frames), dtype=np.float32)
+    
+    step_progress_bar = st.progress(0)
+    
+    for k, t in enumerate(times):
+        # Calculate geometry
+        vx, vy, cx, cy, tip = get_epicycle_geometry(sel_comps, t, center)
+        
+        drawn_path[0, k] = tip.real
+        drawn_path[1, k] = tip.imag
+        
+        # Trace 0 (原始路径) 是静态的，不必在每一帧里重复保存
+        frames.append(go.Frame(data=[
+            go.Scatter(x=drawn_path[0, :k+1], y=drawn_path[1, :k+1]), # Trace 1
+            go.Scatter(x=np.array(vx, dtype=np.float32), y=np.array(vy, dtype=np.float32)), # Trace 2
+            go.Scatter(x=np.array(cx, dtype=np.float32), y=np.array(cy, dtype=np.float32)), # Trace 3
+            go.Scatter(x=[tip.real], y=[tip.imag]) # Trace 4
+        ], traces=[1, 2, 3, 4], name=f"f{k}"))
+        
+        if k % 10 == 0: step_progress_bar.progress((k + 1) / n_frames)
+
+    step_progress_bar.empty()
+    
+    fig.update(frames=frames)
+    
+    # Layout Setting
+    mid_x, mid_y, span = get_view_box(orig_x_visual, orig_y_visual)
+    
+    fig.update_layout(
+        template="plotly_dark",
+        height=700,
+        paper_bgcolor='#0E1117',
+        xaxis=dict(range=[mid_x - span/2, mid_x + span/2], visible=False, scaleanchor='y'),
+        yaxis=dict(range=[mid_y - span/2, mid_y + span/2], visible=False, scaleratio=1),
+        updatemenus=[dict(
+            type="buttons", 
+            buttons=[dict(label="▶ 播放", method="animate", args=[None, dict(frame=dict(duration=20, redraw=True), fromcurrent=True, mode="immediate")])],
+            x=0.5, y=0.05, xanchor="center",
+            bgcolor="#333", bordercolor="#00F0FF", font=dict(color="#00F0FF")
+        )],
+        margin=dict(l=0,r=0,t=0,b=0),
+        showlegend=True,
+        legend=dict(x=0.01, y=0.99, bgcolor='rgba(0,0,0,0.5)')
+    )
+    
+    return fig
+
 def render_page_2d():
     st.title("🎨 二维绘图艺术馆 (2D Fourier Art)")
     st.markdown("用**复数傅里叶变换 (FFT)** 重构你的灵魂画作。")
@@ -427,12 +570,13 @@ def render_page_2d():
     # Data Processing
     coords = None
     coords_len = 0
-    # Original Path (Visual with breaks)
-    orig_x_visual = []
-    orig_y_visual = []
+    # Original Path (Visual with NaN breaks, float32)
+    orig_x_visual = np.empty(0, dtype=np.float32)
+    orig_y_visual = np.empty(0, dtype=np.float32)
     
     if canvas.json_data and len(canvas.json_data["objects"]) > 0:
         all_pts = [] # For FFT (Continuous)
+        seg_x, seg_y = [], []
         
         for obj in canvas.json_data["objects"]:
             if "path" in obj:
@@ -452,10 +596,12 @@ def render_page_2d():
                     xs = pts_arr[:, 0]
                     ys = 300 - pts_arr[:, 1]
                     
-                    orig_x_visual.extend(xs.tolist())
-                    orig_x_visual.append(None) # Break line
-                    orig_y_visual.extend(ys.tolist())
-                    orig_y_visual.append(None) # Break line
+                    seg_x.extend([xs, [np.nan]]) # NaN = Break line
+                    seg_y.extend([ys, [np.nan]])
+        
+        if seg_x:
+            orig_x_visual = np.concatenate(seg_x).astype(np.float32)
+            orig_y_visual = np.concatenate(seg_y).astype(np.float32)
         
         if len(all_pts) > 3:
             coords = np.array(all_pts)
@@ -507,139 +653,254 @@ def render_page_2d():
 
     # Animation Area
     st.divider()
+    anim_tag = (n_val, hash(coords.tobytes()))
     if coords is not None and st.session_state.get('run_animation_2d'):
         sel_comps = components[:n_val]
         
-        # Frames setting
-        n_frames = 120 
-        # 修改关键点：让时间稍微小于 1.0 (例如 0.99)，
-        # 避免 t=1.0 时傅里叶级数严格回到起点 (周期性)，从而在视觉上产生闭合
-        times = np.linspace(0, 0.995, n_frames)
+        # 动画 Figure 体积随图形复杂度增长，放入会话缓存，翻页/空闲/超预算时回收
+        cache = get_session_cache()
+        fig = cache.get("anim_2d", anim_tag)
+        if fig is None:
+            fig = build_epicycle_figure(sel_comps, center, orig_x_visual, orig_y_visual)
+            cache.put("anim_2d", anim_tag, fig, get_cache_room())
         
-        # Init Figure with Dark Background
-        fig = go.Figure()
+        st.plotly_chart(fig, use_container_width=True)
 
-        # --- Pre-calculate State At t=0 for Initialization ---
-        # 这一步至关重要：如果初始 Trace 数据为空，Plotly 动画可能无法正确渲染后续帧的线条和形状。
-        # 我们先计算出第一帧的数据，填入初始 Figure 中，确保“所见即所得”。
-        init_vx, init_vy, init_cx, init_cy, init_tip = get_epicycle_geometry(sel_comps, times[0], center)
-        
-        # 1. Original Path (Trace 0)
-        fig.add_trace(go.Scatter(
-            x=orig_x_visual, y=orig_y_visual, 
-            mode='lines', 
-            line=dict(color='grey', dash='dot', width=1), 
-            connectgaps=False, # Important
-            name='原始路径',
-            hoverinfo='skip'
-        ))
-        
-        # 2. Drawn Path (Trace 1)
-        # 初始化为起点，而不是空列表
-        fig.add_trace(go.Scatter(
-            x=[init_tip.real], y=[init_tip.imag], 
-            mode='lines', 
-            line=dict(color='#00FFFF', width=4), 
-            name='重构路径'
-        ))
-        
-        # 3. Vectors (Trace 2)
-        # 初始化为 t=0 时的矢量链
-        fig.add_trace(go.Scatter(
-            x=init_vx, y=init_vy, 
-            mode='lines+markers', 
-            line=dict(color='#FFFF00', width=2), 
-            marker=dict(size=4, color='white'),
-            connectgaps=False, # CRITICAL for Vectors
-            name='矢量链'
-        ))
-        
-        # 4. Circles (Trace 3)
-        # 初始化为 t=0 时的圆
-        fig.add_trace(go.Scatter(
-            x=init_cx, y=init_cy, 
-            mode='lines', 
-            opacity=0.3, 
-            line=dict(color='grey', width=1), 
-            connectgaps=False, # CRITICAL for Circles
-            name='矢量圆',
-            hoverinfo='skip'
-        ))
-        
-        # 5. Pen Tip (Trace 4)
-        # 初始化为 t=0 时的笔尖
-        fig.add_trace(go.Scatter(
-            x=[init_tip.real], y=[init_tip.imag],
-            mode='markers',
-            marker=dict(color='red', size=5),
-            name='笔尖'
-        ))
-
-        # Generate Frames
-        frames = []
-        drawn_path_x = []
-        drawn_path_y = []
-        
-        step_progress_bar = st.progress(0)
-        
-        for k, t in enumerate(times):
-            # Calculate geometry
-            vx, vy, cx, cy, tip = get_epicycle_geometry(sel_comps, t, center)
-            
-            drawn_path_x.append(tip.real)
-            drawn_path_y.append(tip.imag)
-            
-            frames.append(go.Frame(data=[
-                go.Scatter(x=orig_x_visual, y=orig_y_visual), # Trace 0
-                go.Scatter(x=drawn_path_x, y=drawn_path_y), # Trace 1
-                go.Scatter(x=vx, y=vy), # Trace 2
-                go.Scatter(x=cx, y=cy), # Trace 3
-                go.Scatter(x=[tip.real], y=[tip.imag]) # Trace 4
-            ], name=f"f{k}"))
-            
-            if k % 10 == 0: step_progress_bar.progress((k + 1) / n_frames)
+    # Export Area
+    render_export_2d(components[:n_val], center, orig_x_visual, orig_y_visual, anim_tag)
 
-        step_progress_bar.empty()
-        
-        fig.update(frames=frames)
-        
-        # Layout Setting
-        if len(orig_x_visual) > 0:
-            valid_x = [x for x in orig_x_visual if x is not None]
-            valid_y = [y for y in orig_y_visual if y is not None]
-            min_x, max_x = np.min(valid_x), np.max(valid_x)
-            min_y, max_y = np.min(valid_y), np.max(valid_y)
-            span = max(max_x - min_x, max_y - min_y) * 1.3
-            mid_x, mid_y = (min_x + max_x)/2, (min_y + max_y)/2
-        else:
-             mid_x, mid_y = 150, 150
-             span = 300
-        
-        fig.update_layout(
-            template="plotly_dark",
-            height=700,
-            paper_bgcolor='#0E1117',
-            xaxis=dict(range=[mid_x - span/2, mid_x + span/2], visible=False, scaleanchor='y'),
-            yaxis=dict(range=[mid_y - span/2, mid_y + span/2], visible=False, scaleratio=1),
-            updatemenus=[dict(
-                type="buttons", 
-                buttons=[dict(label="▶ 播放", method="animate", args=[None, dict(frame=dict(duration=20, redraw=True), fromcurrent=True, mode="immediate")])],
-                x=0.5, y=0.05, xanchor="center",
-                bgcolor="#333", bordercolor="#00F0FF", font=dict(color="#00F0FF")
-            )],
-            margin=dict(l=0,r=0,t=0,b=0),
-            showlegend=True,
-            legend=dict(x=0.01, y=0.99, bgcolor='rgba(0,0,0,0.5)')
+@st.cache_resource
+def get_export_pool():
+    """全进程共用的导出进程池，限制同时占用的 CPU 核数"""
+    return epicycle_export.create_export_pool()
+
+def render_export_2d(sel_comps, center, orig_x_visual, orig_y_visual, anim_tag):
+    """离线导出 GIF / MP4，与在线动画使用相同的分量、中心与 N"""
+    st.subheader("🎞️ 导出动画 (GIF / MP4)")
+    if not epicycle_export.PIL_AVAILABLE:
+        st.info("导出功能需要安装 Pillow。")
+        return
+
+    formats = ["GIF"]
+    if epicycle_export.find_mp4_encoder():
+        formats.append("MP4")
+    else:
+        st.caption("未检测到带 libx264 的 ffmpeg，仅支持导出 GIF。")
+
+    col_fmt, col_btn = st.columns([1, 1])
+    with col_fmt:
+        fmt = st.radio("导出格式", formats, horizontal=True, key="export_fmt_2d").lower()
+    with col_btn:
+        start_export = st.button("🎬 生成动画文件")
+
+    # 导出结果同样放入会话缓存，随翻页/空闲/超预算一起回收
+    cache = get_session_cache()
+    export_tag = anim_tag + (fmt,)
+    result = cache.get("export_2d", export_tag)
+    if start_export:
+        progress_bar = st.progress(0, text="正在服务器端逐帧绘制...")
+        try:
+            result = epicycle_export.export_epicycle_animation(
+                sel_comps, center, orig_x_visual, orig_y_visual,
+                get_animation_times(), get_view_box(orig_x_visual, orig_y_visual),
+                fmt=fmt, executor=get_export_pool(),
+                progress=lambda done, total: progress_bar.progress(done / total, text=f"已绘制 {done}/{total} 帧"),
+            )
+        except BrokenProcessPool:
+            get_export_pool.clear() # 进程池异常退出，下次导出时重建
+            st.error("导出进程意外退出，请重试。")
+            return
+        except Exception as e:
+            st.error(f"导出失败: {e}")
+            return
+        finally:
+            progress_bar.empty()
+        # 放不下时不缓存，本次运行仍可下载
+        cache.put("export_2d", export_tag, result, get_cache_room())
+
+    if result is not None:
+        st.caption(
+            f"共 {result['n_frames']} 帧，绘制耗时 {result['render_seconds']:.2f} s，"
+            f"速度 {result['frames_per_second']:.1f} 帧/秒，文件大小 {len(result['data']) / 1024:.0f} KB"
         )
-        
-        st.plotly_chart(fig, use_container_width=True)
+        st.download_button(
+            f"⬇️ 下载 {fmt.upper()}", data=result['data'],
+            file_name=result['file_name'], mime=result['mime']
+        )
+
+# ==========================================
+# 5. 会话内存管理 (Session Memory Budget)
+# ==========================================
+SESSION_MEMORY_BUDGET = 8 * 1024 * 1024 # 单个会话的内存预算 (字节)
+SESSION_IDLE_SECONDS = 300 # 空闲超过该时长，派生对象即被回收
+CHAT_HISTORY_LIMIT = 20 # 最多保留的聊天消息条数
+CHAT_MESSAGE_MAX_CHARS = 800 # 单条消息最多保留的字符数
+
+class SessionCache:
+    """存放可随时重建的大对象 (动画 Figure 与帧)，翻页、空闲或超预算时整体回收"""
+    def __init__(self):
+        self.items = {} # name -> (tag, obj, nbytes)
+        self.rejected = {} # name -> (tag, nbytes)，放不下的对象不必每次重新估算
+        self.last_active = time.time()
+        self.lock = threading.Lock()
+
+    def get(self, name, tag):
+        with self.lock:
+            entry = self.items.get(name)
+        if entry is not None and entry[0] == tag:
+            return entry[1]
+        return None
+
+    def put(self, name, tag, obj, room):
+        """
+        在剩余空间 room (字节) 内放入对象，放不下则不缓存并返回 False。
+
+        room 是预算扣除缓存无法释放的部分 (画布、聊天记录、控件值等) 后留给缓存的空间。
+        """
+        with self.lock:
+            self.items.pop(name, None)
+            rejected = self.rejected.get(name)
+        if room <= 0 or (rejected is not None and rejected[0] == tag and rejected[1] > room):
+            return False
+
+        # 体积在放入时估算一次，避免每次刷新都遍历大对象
+        nbytes = estimate_nbytes(obj)
+        with self.lock:
+            if nbytes > room:
+                self.rejected[name] = (tag, nbytes)
+                return False
+            # 为新对象腾出空间：其余缓存项合计超出时一并回收
+            if nbytes + sum(entry[2] for entry in self.items.values()) > room:
+                self.items.clear()
+            self.items[name] = (tag, obj, nbytes)
+            self.rejected.pop(name, None)
+        return True
+
+    def clear(self):
+        with self.lock:
+            self.items.clear()
+
+    def nbytes(self):
+        with self.lock:
+            return sum(entry[2] for entry in self.items.values())
+
+@st.cache_resource
+def get_session_registry():
+    """进程内所有会话缓存的登记表 (弱引用，会话结束后自动消失)，用于回收其他空闲会话"""
+    # 脚本每次重跑都会重新执行模块代码，登记表必须放在 cache_resource 中才能跨会话共享
+    return weakref.WeakSet(), threading.Lock()
+
+def get_session_cache():
+    """获取 (必要时创建) 当前会话的派生对象缓存"""
+    if "derived_cache" not in st.session_state:
+        cache = SessionCache()
+        registry, lock = get_session_registry()
+        with lock:
+            registry.add(cache)
+        st.session_state.derived_cache = cache
+    return st.session_state.derived_cache
+
+def estimate_nbytes(obj, _seen=None):
+    """粗略估算对象及其引用内容占用的字节数"""
+    if _seen is None:
+        _seen = set()
+    if id(obj) in _seen:
+        return 0
+    _seen.add(id(obj))
+
+    if isinstance(obj, np.ndarray):
+        return obj.nbytes
+    if isinstance(obj, go.Figure):
+        obj = obj.to_plotly_json()
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(estimate_nbytes(k, _seen) + estimate_nbytes(v, _seen) for k, v in obj.items())
+    elif isinstance(obj, (list, tuple, set)):
+        size += sum(estimate_nbytes(v, _seen) for v in obj)
+    return size
+
+def append_chat_message(role, content):
+    """追加一条聊天记录，并保持历史在上限以内"""
+    if len(content) > CHAT_MESSAGE_MAX_CHARS:
+        content = content[:CHAT_MESSAGE_MAX_CHARS] + "…"
+    st.session_state.chat_history.append({"role": role, "content": content})
+    compact_chat_history()
+
+def compact_chat_history():
+    """只保留最近 CHAT_HISTORY_LIMIT 条消息"""
+    history = st.session_state.get("chat_history")
+    if history is not None and len(history) > CHAT_HISTORY_LIMIT:
+        st.session_state.chat_history = history[-CHAT_HISTORY_LIMIT:]
+
+def enforce_session_budget(page):
+    """每次运行开始时调用：回收空闲会话与翻页前的派生对象"""
+    now = time.time()
+    cache = get_session_cache()
+
+    # 1. 顺带清扫进程内空闲的会话 (包括空闲后刚回来的本会话)
+    registry, lock = get_session_registry()
+    with lock:
+        caches = list(registry)
+    for other in caches:
+        if now - other.last_active > SESSION_IDLE_SECONDS:
+            other.clear()
+
+    # 2. 翻页：上一页的大对象不再需要
+    if st.session_state.get("current_page") != page:
+        cache.clear()
+        st.session_state.run_animation_2d = False
+        st.session_state.current_page = page
+
+    cache.last_active = now
+    compact_chat_history()
+
+def get_cache_room():
+    """预算中留给派生对象缓存的字节数 (扣除 session_state 中缓存以外的部分)"""
+    used = sum(estimate_nbytes(st.session_state[key]) for key in st.session_state.keys() if key != "derived_cache")
+    return SESSION_MEMORY_BUDGET - used
+
+def session_memory_report():
+    """当前会话 session_state 各项的估算字节数 (从大到小)"""
+    report = []
+    for key in st.session_state.keys():
+        if key == "derived_cache":
+            nbytes = get_session_cache().nbytes()
+        else:
+            nbytes = estimate_nbytes(st.session_state[key])
+        report.append((key, nbytes))
+    report.sort(key=lambda item: item[1], reverse=True)
+    return report
+
+def render_memory_report():
+    """侧边栏内存报告；超出预算时回收派生对象"""
+    report = session_memory_report()
+    total = sum(nbytes for _, nbytes in report)
+
+    # 缓存放入时已受预算约束；这里处理放入后聊天记录等增长导致的超支
+    evicted = False
+    cache = get_session_cache()
+    if total > SESSION_MEMORY_BUDGET and cache.nbytes() > 0:
+        cache.clear()
+        evicted = True
+        report = session_memory_report()
+        total = sum(nbytes for _, nbytes in report)
+
+    with st.sidebar.expander("🧮 会话内存报告", expanded=False):
+        st.progress(min(total / SESSION_MEMORY_BUDGET, 1.0))
+        st.caption(f"合计 {total / 1024:.1f} KB / 预算 {SESSION_MEMORY_BUDGET / 1024 / 1024:.0f} MB")
+        for key, nbytes in report[:8]:
+            st.markdown(f"`{key}`: {nbytes / 1024:.1f} KB")
+        if evicted:
+            st.warning("已超出预算，缓存的动画已被回收，下次播放时将重新生成。")
 
 # ==========================================
-# 5. 主程序
+# 6. 主程序
 # ==========================================
 def main():
     st.sidebar.title("🌌 导航")
     page = st.sidebar.radio("选择实验室", ["一维信号实验室", "二维绘图艺术馆"])
+    enforce_session_budget(page)
     
     # 渲染页面
     if page == "一维信号实验室":
@@ -649,6 +910,7 @@ def main():
         
     # 全局组件
     render_ai_chat_area()
+    render_memory_report()
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,332 @@
+"""
+Epicycle 动画离线导出 (GIF / MP4)
+
+在服务器端用 Pillow 把动画逐帧栅格化，帧按块分发到进程池并行绘制，
+再编码为 GIF；如果本机装有带 libx264 的 ffmpeg，也可以编码为 MP4。
+GIF 帧在工作进程中直接压缩编码，Streamlit 进程只拼接压缩后的数据；
+MP4 帧以单字节调色板格式传回，限量在途、边到达边写入编码器。
+
+工作进程以 spawn 方式启动，创建进程池时会暂时隐藏 Streamlit 临时 __main__ 的 __file__，
+使工作进程只导入本模块 (以及 numpy / Pillow)，而不会重新执行 app.py。
+"""
+import os
+import io
+import sys
+import time
+import shutil
+import tempfile
+import subprocess
+import functools
+import threading
+import contextlib
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import numpy as np
+
+# Pillow 随 Streamlit 一起安装，但仍按可选依赖处理
+try:
+    from PIL import Image, ImageDraw, GifImagePlugin
+    PIL_AVAILABLE = True
+except ImportError:
+    PIL_AVAILABLE = False
+
+# 调色板索引 (与在线动画的配色保持一致)
+BG, ORIG, CIRCLE, DRAWN, VECTOR, JOINT, TIP = range(7)
+PALETTE = [
+    (0x0E, 0x11, 0x17), # 背景 #0E1117
+    (0x80, 0x80, 0x80), # 原始路径 grey
+    (0x3A, 0x3C, 0x41), # 矢量圆 (grey, opacity 0.3)
+    (0x00, 0xFF, 0xFF), # 重构路径 #00FFFF
+    (0xFF, 0xFF, 0x00), # 矢量链 #FFFF00
+    (0xFF, 0xFF, 0xFF), # 矢量节点 white
+    (0xFF, 0x00, 0x00), # 笔尖 red
+]
+FLAT_PALETTE = [c for rgb in PALETTE for c in rgb] + [0] * (768 - 3 * len(PALETTE))
+PALETTE_RGB = np.array(PALETTE, dtype=np.uint8) # 调色板索引 -> RGB 查找表
+
+DEFAULT_SIZE = 480 # 输出边长 (像素，须为偶数以兼容 yuv420p)
+DEFAULT_FPS = 25
+DEFAULT_CHUNK = 12 # 每个任务包含的帧数
+MAX_CHUNKS_IN_FLIGHT = 4 # 同时提交的任务块上限，限制已绘制未写出的帧占用的内存
+
+_MAIN_LOCK = threading.Lock() # 串行化对 sys.modules['__main__'] 的临时修改
+
+
+@functools.lru_cache(maxsize=1)
+def find_mp4_encoder():
+    """返回支持 libx264 的 ffmpeg 路径，不存在时返回 None"""
+    ffmpeg = shutil.which("ffmpeg")
+    if ffmpeg is None:
+        return None
+    try:
+        out = subprocess.run([ffmpeg, "-hide_banner", "-encoders"], capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return ffmpeg if "libx264" in out.stdout else None
+
+
+def _warm_up():
+    """预热任务：绘制并编码一帧小图，使工作进程完成模块导入与绘图/编码器初始化"""
+    chain = np.array([150 + 150j, 160 + 150j])
+    _render_chunk((0, chain[None, :], chain[-1:], np.array([10.0]), [], (150.0, 150.0, 300.0), 16, "gif", 40))
+
+
+@contextlib.contextmanager
+def _hidden_main_file():
+    """
+    暂时移除 __main__ 的 __file__，期间 spawn 出的子进程不会重新执行主脚本。
+
+    streamlit run 期间，__main__ 是 Streamlit 临时安装的模块，__file__ 指向 app.py
+    (其 __spec__ 为 None)；spawn 子进程会据此以 __mp_main__ 身份重新执行整个 app.py。
+    """
+    main = sys.modules.get("__main__")
+    with _MAIN_LOCK:
+        if main is None or getattr(main, "__spec__", None) is not None or not hasattr(main, "__file__"):
+            yield
+            return
+        main_file = main.__file__
+        del main.__file__
+        try:
+            yield
+        finally:
+            main.__file__ = main_file
+
+
+def create_export_pool(max_workers=None):
+    """创建并预热导出用进程池 (spawn 方式，避免在多线程的 Streamlit 进程中 fork)"""
+    if max_workers is None:
+        max_workers = min(4, os.cpu_count() or 1)
+    with _hidden_main_file():
+        pool = ProcessPoolExecutor(max_workers=max_workers, mp_context=multiprocessing.get_context("spawn"),
+                                   initializer=_warm_up)
+        # 进程池在 submit 时按需启动工作进程，且只有任务完成后才会复用空闲进程；
+        # 连续提交 max_workers 个预热任务即可在此处启动全部工作进程，之后不会再启动新进程。
+        # 等待预热完成，使首次导出的计时不包含进程启动与模块导入
+        wait([pool.submit(_warm_up) for _ in range(max_workers)])
+    return pool
+
+
+def epicycle_chains(components, center, times):
+    """
+    所有帧的矢量链节点 (n_frames, n_comps + 1) 复数数组。
+
+    第 0 列为中心，最后一列为笔尖；与 app.get_epicycle_geometry 的逐帧计算等价。
+    """
+    freqs = np.array([c['freq'] for c in components], dtype=float)
+    amps = np.array([c['amp'] for c in components], dtype=float)
+    phases = np.array([c['phase'] for c in components], dtype=float)
+
+    vectors = amps * np.exp(1j * (2 * np.pi * np.outer(times, freqs) + phases))
+    origin = center[0] + 1j * center[1]
+    chains = np.empty((len(times), len(components) + 1), dtype=complex)
+    chains[:, 0] = origin
+    chains[:, 1:] = origin + np.cumsum(vectors, axis=1)
+    return chains, amps
+
+
+def split_path(xs, ys):
+    """把以 NaN 分隔的原始路径拆成若干段复数数组"""
+    z = np.asarray(xs, dtype=float) + 1j * np.asarray(ys, dtype=float)
+    segments = [seg[~np.isnan(seg)] for seg in np.split(z, np.flatnonzero(np.isnan(z)))]
+    return [seg for seg in segments if len(seg) > 0]
+
+
+def _to_pixels(z, view, size):
+    """复平面坐标 -> 图像像素坐标 (y 轴向上)，返回扁平列表 [x0, y0, x1, y1, ...]"""
+    mid_x, mid_y, span = view
+    scale = size / span
+    px = (z.real - (mid_x - span / 2)) * scale
+    py = size - (z.imag - (mid_y - span / 2)) * scale
+    return np.column_stack([px, py]).ravel().tolist()
+
+
+def _dot(draw, x, y, r, color):
+    draw.ellipse([x - r, y - r, x + r, y + r], fill=color)
+
+
+def _draw_frame(k, chain, tips, amps, orig_segments, view, size):
+    """绘制第 k 帧，返回调色板图像"""
+    scale = size / view[2]
+    line_w = max(1, size // 160)
+    img = Image.new("P", (size, size), BG)
+    img.putpalette(FLAT_PALETTE)
+    draw = ImageDraw.Draw(img)
+
+    # 1. 原始路径
+    for seg in orig_segments:
+        if len(seg) > 1:
+            draw.line(_to_pixels(seg, view, size), fill=ORIG, width=1)
+
+    # 2. 矢量圆 (与在线动画一致，只画半径 > 0.5 的圆)
+    centers = _to_pixels(chain[:-1], view, size)
+    for j, r in enumerate(amps):
+        if r > 0.5:
+            cx, cy, rp = centers[2 * j], centers[2 * j + 1], r * scale
+            draw.ellipse([cx - rp, cy - rp, cx + rp, cy + rp], outline=CIRCLE)
+
+    # 3. 重构路径 (截至当前帧的笔尖轨迹)
+    if k > 0:
+        draw.line(_to_pixels(tips[:k + 1], view, size), fill=DRAWN, width=2 * line_w, joint="curve")
+
+    # 4. 矢量链与节点
+    pts = _to_pixels(chain, view, size)
+    draw.line(pts, fill=VECTOR, width=line_w)
+    for j in range(0, len(pts) - 2, 2):
+        _dot(draw, pts[j], pts[j + 1], line_w, JOINT)
+
+    # 5. 笔尖
+    _dot(draw, pts[-2], pts[-1], 2 * line_w, TIP)
+    return img
+
+
+def _gif_block(img, prev, frame_ms):
+    """把一帧压缩为 GIF 图像块；有上一帧时只编码变化的矩形区域"""
+    if prev is None:
+        return b"".join(GifImagePlugin.getdata(img, duration=frame_ms))
+    diff = np.asarray(img) != np.asarray(prev)
+    rows, cols = np.flatnonzero(diff.any(axis=1)), np.flatnonzero(diff.any(axis=0))
+    if len(rows) == 0:
+        rows, cols = np.array([0]), np.array([0])
+    box = (int(cols[0]), int(rows[0]), int(cols[-1]) + 1, int(rows[-1]) + 1)
+    return b"".join(GifImagePlugin.getdata(img.crop(box), offset=box[:2], duration=frame_ms))
+
+
+def _render_chunk(task):
+    """进程池工作函数：绘制一块连续帧，GIF 返回编码好的帧数据，MP4 返回调色板索引字节串"""
+    start, chains, tips, amps, orig_segments, view, size, fmt, frame_ms = task
+    frames = []
+    # GIF 需要上一帧做差分：块内首帧之前的那一帧由 chains[0] 额外给出 (start > 0 时)
+    prev = None
+    offset = 1 if (fmt == "gif" and start > 0) else 0
+    if offset:
+        prev = _draw_frame(start - 1, chains[0], tips, amps, orig_segments, view, size)
+
+    for i, chain in enumerate(chains[offset:]):
+        img = _draw_frame(start + i, chain, tips, amps, orig_segments, view, size)
+        if fmt == "gif":
+            # 帧使用全局调色板，在此直接压缩为 GIF 图像块
+            frames.append(_gif_block(img, prev, frame_ms))
+            prev = img
+        else:
+            frames.append(img.tobytes())
+    return frames
+
+
+def _gif_header(size, frame_ms):
+    """GIF 文件头：全局调色板 + 无限循环"""
+    img = Image.new("P", (size, size), BG)
+    img.putpalette(FLAT_PALETTE)
+    header, _ = GifImagePlugin.getheader(img, info={"loop": 0, "duration": frame_ms})
+    return b"".join(header)
+
+
+def _ordered_results(executor, fn, tasks, max_in_flight):
+    """按顺序产出结果，同时最多只有 max_in_flight 个任务在途"""
+    pending = deque()
+    for task in tasks:
+        pending.append(executor.submit(fn, task))
+        if len(pending) >= max_in_flight:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def export_epicycle_animation(components, center, orig_x_visual, orig_y_visual, times, view,
+                              fmt="gif", size=DEFAULT_SIZE, fps=DEFAULT_FPS, chunk_size=DEFAULT_CHUNK,
+                              executor=None, progress=None):
+    """
+    把 Epicycle 动画导出为 GIF 或 MP4。
+
+    components / center / times / view 与在线动画使用的完全相同；
+    progress(done, total) 会在每块帧绘制完成后被调用。
+    返回 dict: data, mime, file_name, n_frames, render_seconds, frames_per_second。
+    """
+    if fmt not in ("gif", "mp4"):
+        raise ValueError(f"unsupported export format: {fmt!r} (expected 'gif' or 'mp4')")
+    if not PIL_AVAILABLE:
+        raise RuntimeError("Pillow is required for animation export")
+    ffmpeg = find_mp4_encoder() if fmt == "mp4" else None
+    if fmt == "mp4" and ffmpeg is None:
+        raise RuntimeError("ffmpeg with libx264 not found, MP4 export is unavailable")
+    size += size % 2
+
+    chains, amps = epicycle_chains(components, center, times)
+    tips = chains[:, -1]
+    orig_segments = split_path(orig_x_visual, orig_y_visual)
+    n_frames = len(times)
+
+    frame_ms = int(round(1000 / fps))
+    tasks = []
+    for start in range(0, n_frames, chunk_size):
+        stop = min(start + chunk_size, n_frames)
+        first = start - 1 if (fmt == "gif" and start > 0) else start
+        tasks.append((start, chains[first:stop], tips[:stop], amps, orig_segments, view, size, fmt, frame_ms))
+
+    own_pool = executor is None
+    if own_pool:
+        executor = create_export_pool()
+
+    gif = io.BytesIO()
+    encoder = None
+    out_path = None
+    t0 = time.perf_counter()
+    try:
+        if ffmpeg:
+            fd, out_path = tempfile.mkstemp(suffix=".mp4")
+            os.close(fd)
+            encoder = subprocess.Popen(
+                [ffmpeg, "-y", "-loglevel", "error",
+                 "-f", "rawvideo", "-pix_fmt", "rgb24", "-s", f"{size}x{size}", "-r", str(fps), "-i", "-",
+                 "-c:v", "libx264", "-pix_fmt", "yuv420p", "-movflags", "+faststart", out_path],
+                stdin=subprocess.PIPE, stderr=subprocess.PIPE,
+            )
+        else:
+            gif.write(_gif_header(size, frame_ms))
+
+        done = 0
+        # 结果按顺序到达：GIF 块直接拼接，MP4 帧展开为 RGB 后写入编码器，都不在内存中堆积
+        try:
+            for chunk in _ordered_results(executor, _render_chunk, tasks, MAX_CHUNKS_IN_FLIGHT):
+                if encoder is not None:
+                    for raw in chunk:
+                        encoder.stdin.write(PALETTE_RGB[np.frombuffer(raw, dtype=np.uint8)].tobytes())
+                else:
+                    for block in chunk:
+                        gif.write(block)
+                done += len(chunk)
+                if progress is not None:
+                    progress(done, n_frames)
+        except BrokenPipeError:
+            # ffmpeg 提前退出 (例如参数不被支持)，下面的 communicate() 会取回它的报错
+            pass
+        render_seconds = time.perf_counter() - t0
+
+        if encoder is not None:
+            _, err = encoder.communicate()
+            if encoder.returncode != 0 or done < n_frames:
+                raise RuntimeError(f"ffmpeg failed: {err.decode(errors='ignore').strip()}")
+            with open(out_path, "rb") as f:
+                data = f.read()
+            mime, ext = "video/mp4", "mp4"
+        else:
+            gif.write(b";") # GIF trailer
+            data = gif.getvalue()
+            mime, ext = "image/gif", "gif"
+    finally:
+        if encoder is not None and encoder.poll() is None:
+            encoder.kill()
+        if out_path is not None and os.path.exists(out_path):
+            os.remove(out_path)
+        if own_pool:
+            executor.shutdown()
+
+    return {
+        'data': data,
+        'mime': mime,
+        'file_name': f"fourier_epicycle_N{len(components)}.{ext}",
+        'n_frames': n_frames,
+        'render_seconds': render_seconds,
+        'frames_per_second': n_frames / render_seconds if render_seconds > 0 else float('inf'),
+    }
@@ -0,0 +1,261 @@
+"""
+题目 1 / 题目 2 的向量化数值工具
+
+把 notebook 里逐项 quad、np.vectorize、逐个 n 循环的写法换成整批数组运算：
+* 傅里叶系数：一次 FFT，或一次批量 Gauss-Legendre 求积得到全部 a_n, b_n
+* 梯形法 / Simpson 法：所有 n 的节点拼在一起，只调用一次 f
+* 蒙特卡洛：每个 N 独立、按固定大小分块采样，内存占用与 N 无关
+
+直接运行本文件会与 notebook 中的原始写法做计时对比：
+    python fast_numerics.py
+"""
+import time
+
+import numpy as np
+from scipy.integrate import quad
+
+# 蒙特卡洛每块样本数 (2^16 个 float64 约 512 KB)
+MC_CHUNK_SIZE = 1 << 16
+
+
+# ==========================================
+# 1. 向量化波形
+# ==========================================
+def square_wave(x):
+    """方波 (周期 2pi)：[0, pi) 上为 1，[pi, 2pi) 上为 -1，可直接作用于数组"""
+    x = np.mod(x, 2 * np.pi)
+    return np.where(x < np.pi, 1.0, -1.0)
+
+
+def triangle_wave(x):
+    """三角波 (周期 2pi)：[-pi, pi] 上为 |x|，可直接作用于数组"""
+    x = np.mod(np.asarray(x, dtype=float) + np.pi, 2 * np.pi) - np.pi
+    return np.abs(x)
+
+
+# ==========================================
+# 2. 傅里叶系数
+# ==========================================
+def fourier_coefficients_fft(f, n_max, period=2 * np.pi, n_samples=4096):
+    """
+    用一次 FFT 计算 a_0..a_n_max 与 b_0..b_n_max。
+
+    在一个周期的 n_samples 个等分子区间中点上采样 (中点公式，避开 0、pi 等跳变点)，
+    rfft 的第 n 个分量乘以半步相移后给出 a_n - i*b_n。
+    n_samples 必须大于 2*n_max 以避免混叠。
+    """
+    if n_samples <= 2 * n_max:
+        raise ValueError("n_samples must be greater than 2 * n_max")
+    x = (np.arange(n_samples) + 0.5) * (period / n_samples)
+    shift = np.exp(-1j * np.pi * np.arange(n_max + 1) / n_samples)
+    coeffs = np.fft.rfft(f(x))[: n_max + 1] * shift * (2.0 / n_samples)
+    return coeffs.real.copy(), -coeffs.imag
+
+
+def gauss_legendre_nodes(a, b, n_nodes=16, n_panels=64, breakpoints=()):
+    """
+    复合 Gauss-Legendre 求积的节点与权重 (一维数组)。
+
+    [a, b] 先按 breakpoints 切开 (例如方波的跳变点)，每段再均分为 n_panels 个子区间，
+    每个子区间使用 n_nodes 阶 Gauss-Legendre 公式。
+    """
+    edges = np.unique(np.concatenate(([a, b], [p for p in breakpoints if a < p < b])))
+    t, w = np.polynomial.legendre.leggauss(n_nodes)
+    # 所有子区间的端点: (段数 * n_panels + 1,)
+    panel_edges = np.concatenate(
+        [np.linspace(lo, hi, n_panels + 1)[:-1] for lo, hi in zip(edges[:-1], edges[1:])] + [[b]]
+    )
+    lo, hi = panel_edges[:-1, None], panel_edges[1:, None]
+    half = (hi - lo) / 2
+    x = (lo + hi) / 2 + half * t
+    weights = half * w
+    return x.ravel(), weights.ravel()
+
+
+def fourier_coefficients_gauss(f, n_max, period=2 * np.pi, n_nodes=16, n_panels=64, breakpoints=()):
+    """
+    用一次批量 Gauss-Legendre 求积计算 a_0..a_n_max 与 b_0..b_n_max。
+
+    f 只在全部节点上求值一次，随后 cos(nx)/sin(nx) 矩阵与加权函数值做一次矩阵乘法。
+    对方波这类间断函数，把跳变点传入 breakpoints 可得到接近机器精度的结果。
+    """
+    x, w = gauss_legendre_nodes(0.0, period, n_nodes, n_panels, breakpoints)
+    wf = w * f(x)
+    nx = np.outer(np.arange(n_max + 1) * (2 * np.pi / period), x)
+    scale = 2.0 / period
+    return scale * (np.cos(nx) @ wf), scale * (np.sin(nx) @ wf)
+
+
+def fourier_series(x, a, b, period=2 * np.pi):
+    """按系数 a_n, b_n 求傅里叶级数部分和 (a_0/2 + sum a_n cos + b_n sin)"""
+    x = np.asarray(x, dtype=float)
+    n = np.arange(len(a)) * (2 * np.pi / period)
+    nx = np.multiply.outer(x, n)
+    return a[0] / 2 + np.cos(nx[..., 1:]) @ a[1:] + np.sin(nx[..., 1:]) @ b[1:]
+
+
+# ==========================================
+# 3. 梯形法 / Simpson 法 (一次算多个 n)
+# ==========================================
+def _batched_rule(f, a, b, n_values, weight_fn):
+    """把所有 n 的节点拼成一个数组，只调用一次 f，再按段求加权和"""
+    n_values = np.asarray(n_values, dtype=int)
+    if np.any(n_values < 1):
+        raise ValueError("number of segments must be >= 1")
+    if len(n_values) == 0:
+        return np.empty(0)
+    sizes = n_values + 1
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+    # 每个点在所属网格中的下标 j 与所属网格的 n
+    j = np.arange(sizes.sum()) - np.repeat(starts, sizes)
+    n = np.repeat(n_values, sizes)
+    h = (b - a) / n
+    y = f(a + j * h)
+    return np.add.reduceat(weight_fn(j, n) * h * y, starts)
+
+
+def _trapezoidal_weights(j, n):
+    return np.where((j == 0) | (j == n), 0.5, 1.0)
+
+
+def _simpson_weights(j, n):
+    inner = np.where(j % 2 == 1, 4.0, 2.0)
+    return np.where((j == 0) | (j == n), 1.0, inner) / 3.0
+
+
+def trapezoidal_many(f, a, b, n_values):
+    """对 n_values 中的每个 n 计算复合梯形积分，返回与 n_values 等长的数组"""
+    return _batched_rule(f, a, b, n_values, _trapezoidal_weights)
+
+
+def simpsons_many(f, a, b, n_values):
+    """对 n_values 中的每个 n 计算复合 Simpson 积分 (n 必须为偶数)"""
+    if np.any(np.asarray(n_values, dtype=int) % 2 != 0):
+        raise ValueError("Simpson's rule requires even n")
+    return _batched_rule(f, a, b, n_values, _simpson_weights)
+
+
+# ==========================================
+# 4. 蒙特卡洛 (分块采样)
+# ==========================================
+def _mc_sum(f, a, b, n, chunk_size, rng):
+    """分块采样 n 个点并返回 f 值之和，任意时刻只持有一块样本"""
+    total = 0.0
+    for start in range(0, n, chunk_size):
+        total += np.sum(f(rng.uniform(a, b, min(chunk_size, n - start))))
+    return total
+
+
+def monte_carlo_many(f, a, b, n_values, chunk_size=MC_CHUNK_SIZE, rng=None, shared_stream=False):
+    """
+    对 n_values 中的每个 N 给出蒙特卡洛估计 (b-a) * mean(f(x))。
+
+    默认每个 N 独立采样 (与 notebook 一致，误差相互独立，可用于 1/sqrt(N) 收敛图)，
+    样本按 chunk_size 分块生成，内存占用与 N 无关。
+    shared_stream=True 时所有 N 共用同一条随机数流，累计到某个 N 时记录估计值：
+    总采样量降为 max(N)，但各估计值重叠、误差相关。
+    """
+    rng = np.random.default_rng(rng)
+    n_values = np.asarray(n_values, dtype=np.int64)
+    if np.any(n_values < 1):
+        raise ValueError("Monte Carlo sample sizes must be >= 1")
+    estimates = np.empty(len(n_values))
+
+    if not shared_stream:
+        for idx, n in enumerate(n_values):
+            estimates[idx] = (b - a) * _mc_sum(f, a, b, int(n), chunk_size, rng) / n
+        return estimates
+
+    total, drawn = 0.0, 0
+    for idx in np.argsort(n_values):
+        target = int(n_values[idx])
+        total += _mc_sum(f, a, b, target - drawn, chunk_size, rng)
+        drawn = max(drawn, target)
+        estimates[idx] = (b - a) * total / target
+    return estimates
+
+
+# ==========================================
+# 5. 与 notebook 原写法的计时对比
+# ==========================================
+def _timeit(func, repeat=3):
+    best = np.inf
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        func()
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def _notebook_square_wave(x):
+    x = x % (2 * np.pi)
+    if 0 <= x < np.pi:
+        return 1
+    else:
+        return -1
+
+
+def _notebook_coefficients(n_max):
+    an, bn = [], []
+    for n in range(n_max + 1):
+        an.append(quad(lambda x: _notebook_square_wave(x) * np.cos(n * x), 0, 2 * np.pi)[0] / np.pi)
+        bn.append(quad(lambda x: _notebook_square_wave(x) * np.sin(n * x), 0, 2 * np.pi)[0] / np.pi)
+    return np.array(an), np.array(bn)
+
+
+def _notebook_trapezoidal(f, a, b, n):
+    h = (b - a) / n
+    y = f(np.linspace(a, b, n + 1))
+    return h * (0.5 * y[0] + np.sum(y[1:-1]) + 0.5 * y[-1])
+
+
+def _notebook_simpsons(f, a, b, n):
+    h = (b - a) / n
+    y = f(np.linspace(a, b, n + 1))
+    return h / 3 * (y[0] + 4 * np.sum(y[1:n:2]) + 2 * np.sum(y[2:n - 1:2]) + y[-1])
+
+
+def _notebook_monte_carlo(f, n_values):
+    return [np.mean(f(np.random.uniform(0, 1, N))) for N in n_values]
+
+
+def benchmark(n_max=50):
+    """打印新旧写法的耗时对比"""
+    gauss = lambda x: np.exp(-x ** 2)
+    n_values = [4, 8, 16, 32, 64]
+    n_values_mc = [100, 1000, 10000, 100000, 1000000]
+    x_plot = np.linspace(0, 2 * np.pi, 1000)
+    v_square_wave = np.vectorize(_notebook_square_wave)
+
+    cases = [
+        (f"方波系数 n<={n_max} (quad)", lambda: _notebook_coefficients(n_max),
+         "FFT", lambda: fourier_coefficients_fft(square_wave, n_max)),
+        (f"方波系数 n<={n_max} (quad)", lambda: _notebook_coefficients(n_max),
+         "Gauss-Legendre", lambda: fourier_coefficients_gauss(square_wave, n_max, breakpoints=(np.pi,))),
+        ("方波绘图采样 (np.vectorize)", lambda: v_square_wave(x_plot),
+         "np.where", lambda: square_wave(x_plot)),
+        ("梯形+Simpson (逐 n 循环)",
+         lambda: [(_notebook_trapezoidal(np.sin, 0, np.pi, n), _notebook_simpsons(np.sin, 0, np.pi, n)) for n in n_values],
+         "批量", lambda: (trapezoidal_many(np.sin, 0, np.pi, n_values), simpsons_many(np.sin, 0, np.pi, n_values))),
+        # 两边都对每个 N 独立采样，总采样量同为 sum(N)；差距来自 Generator 与缓存友好的分块
+        ("蒙特卡洛 (逐 N 整块分配)", lambda: _notebook_monte_carlo(gauss, n_values_mc),
+         "独立分块", lambda: monte_carlo_many(gauss, 0, 1, n_values_mc, rng=42)),
+    ]
+
+    print(f"{'任务':<28} | {'原写法':>10} | {'新写法':>16} | {'加速比':>8}")
+    print("-" * 72)
+    for old_name, old_fn, new_name, new_fn in cases:
+        t_old, t_new = _timeit(old_fn), _timeit(new_fn)
+        print(f"{old_name:<28} | {t_old * 1e3:>8.2f}ms | {new_name:>10} {t_new * 1e3:>5.2f}ms | {t_old / t_new:>7.1f}x")
+
+    # 精度核对
+    a_fft, b_fft = fourier_coefficients_fft(square_wave, 5)
+    a_gl, b_gl = fourier_coefficients_gauss(square_wave, 5, breakpoints=(np.pi,))
+    b_theory = np.array([4 / (n * np.pi) if n % 2 else 0.0 for n in range(1, 6)])
+    print(f"\nb_1..b_5 理论值: {np.round(b_theory, 4)}")
+    print(f"FFT 最大误差:   {np.max(np.abs(b_fft[1:] - b_theory)):.2e} (a_n: {np.max(np.abs(a_fft)):.2e})")
+    print(f"G-L 最大误差:   {np.max(np.abs(b_gl[1:] - b_theory)):.2e} (a_n: {np.max(np.abs(a_gl)):.2e})")
+
+
+if __name__ == "__main__":
+    benchmark()